@@ -20,6 +20,11 @@ from dataclasses import dataclass, field
 
 import httpx
 
+try:
+    import orjson
+except ImportError:  # optional -- the script only strictly needs httpx
+    orjson = None
+
 # ── Data classes ─────────────────────────────────────────────────────────────
 
 PASS = "PASS"
@@ -47,8 +52,6 @@ class StepResult:
 @dataclass
 class DiagContext:
     email: str
-    base_url: str
-    auth: tuple
     client: httpx.Client
     contact_id: str | None = None
     search_body: dict | None = None
@@ -60,6 +63,20 @@ class DiagContext:
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
+def pretty_json(obj) -> str:
+    """Indented JSON for display; orjson when installed, stdlib json otherwise."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+
+def parse_json(content: bytes):
+    """Decode a response body; orjson when installed, stdlib json otherwise."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
 def banner(step_num: int, name: str):
     print(f"\n{'=' * 70}")
     print(f"  STEP {step_num}: {name}")
@@ -67,25 +84,29 @@ def banner(step_num: int, name: str):
 
 
 def print_response(resp: httpx.Response):
+    """Print request/response details; return the parsed JSON body, or None if not JSON."""
     print(f"  URL:     {resp.request.url}")
     print(f"  Method:  {resp.request.method}")
     print(f"  Status:  {resp.status_code}")
     elapsed = resp.elapsed.total_seconds() if resp.elapsed else "?"
     print(f"  Elapsed: {elapsed}s")
     try:
-        body = resp.json()
-        print(f"  Body:\n{textwrap.indent(json.dumps(body, indent=2), '    ')}")
+        body = parse_json(resp.content)
     except Exception:
         print(f"  Body (raw): {resp.text[:2000]}")
+        return None
+    print(f"  Body:\n{textwrap.indent(pretty_json(body), '    ')}")
+    return body
 
 
 def has_email_dnc(contact_data: dict) -> bool:
     """Check if a contact's data contains an email DNC entry."""
-    dnc_list = contact_data.get("doNotContact", [])
-    for entry in dnc_list:
-        if entry.get("channel") == "email":
-            return True
-    return False
+    return any(e.get("channel") == "email" for e in contact_data.get("doNotContact") or ())
+
+
+def dnc_channels(contact_data: dict) -> set:
+    """Set of channels a contact is on DNC for, e.g. {"email"}."""
+    return {e.get("channel") for e in contact_data.get("doNotContact") or ()}
 
 
 def result_icon(status: str) -> str:
@@ -97,9 +118,8 @@ def result_icon(status: str) -> str:
 
 def step1_connectivity(ctx: DiagContext) -> StepResult:
     banner(1, "Connectivity")
-    url = f"{ctx.base_url}/api/contacts"
     try:
-        resp = ctx.client.get(url, params={"limit": 1}, auth=ctx.auth)
+        resp = ctx.client.get("/api/contacts", params={"limit": 1})
         print_response(resp)
         if resp.status_code == 200:
             return StepResult(1, "Connectivity", PASS, "Mautic reachable, credentials valid")
@@ -114,18 +134,16 @@ def step1_connectivity(ctx: DiagContext) -> StepResult:
 
 def step2_contact_search(ctx: DiagContext) -> StepResult:
     banner(2, "Contact search")
-    url = f"{ctx.base_url}/api/contacts"
     params = {
         "where[0][col]": "email",
         "where[0][expr]": "eq",
         "where[0][val]": ctx.email,
     }
     try:
-        resp = ctx.client.get(url, params=params, auth=ctx.auth)
-        print_response(resp)
+        resp = ctx.client.get("/api/contacts", params=params)
+        body = print_response(resp) or {}
         if resp.status_code != 200:
             return StepResult(2, "Contact search", FAIL, f"Search returned HTTP {resp.status_code}")
-        body = resp.json()
         ctx.search_body = body
         contacts = body.get("contacts", {})
         count = len(contacts)
@@ -164,18 +182,16 @@ def step4_pre_dnc_state(ctx: DiagContext) -> StepResult:
         print("  Skipped — no contact_id from step 3")
         return StepResult(4, "Pre-DNC state", SKIP, "No contact_id")
 
-    url = f"{ctx.base_url}/api/contacts/{ctx.contact_id}"
     try:
-        resp = ctx.client.get(url, auth=ctx.auth)
-        print_response(resp)
+        resp = ctx.client.get(f"/api/contacts/{ctx.contact_id}")
+        body = print_response(resp) or {}
         if resp.status_code != 200:
             return StepResult(4, "Pre-DNC state", FAIL, f"HTTP {resp.status_code}")
 
-        body = resp.json()
         contact = body.get("contact", body)
         ctx.pre_dnc_state = contact
         dnc_list = contact.get("doNotContact", [])
-        print(f"\n  doNotContact entries: {json.dumps(dnc_list, indent=2)}")
+        print(f"\n  doNotContact entries: {pretty_json(dnc_list)}")
 
         if has_email_dnc(contact):
             return StepResult(4, "Pre-DNC state", WARN, "Already on email DNC before add")
@@ -191,16 +207,12 @@ def step5_dnc_add(ctx: DiagContext) -> StepResult:
         print("  Skipped — no contact_id from step 3")
         return StepResult(5, "DNC add", SKIP, "No contact_id")
 
-    url = f"{ctx.base_url}/api/contacts/{ctx.contact_id}/dnc/email/add"
+    url = f"/api/contacts/{ctx.contact_id}/dnc/email/add"
     payload = {"reason": 1, "comments": "Unsubscribed via website (diagnose.py)"}
     try:
-        resp = ctx.client.post(url, json=payload, auth=ctx.auth)
-        print_response(resp)
+        resp = ctx.client.post(url, json=payload)
+        ctx.step5_body = print_response(resp) or {}
         ctx.step5_status = resp.status_code
-        try:
-            ctx.step5_body = resp.json()
-        except Exception:
-            ctx.step5_body = {}
 
         notes_parts = []
         suspects_confirmed = []
@@ -236,25 +248,27 @@ def step6_post_dnc_verify(ctx: DiagContext) -> StepResult:
         print("  Skipped — no contact_id from step 3")
         return StepResult(6, "Post-DNC verify", SKIP, "No contact_id")
 
-    url = f"{ctx.base_url}/api/contacts/{ctx.contact_id}"
     try:
-        resp = ctx.client.get(url, auth=ctx.auth)
-        print_response(resp)
+        resp = ctx.client.get(f"/api/contacts/{ctx.contact_id}")
+        body = print_response(resp) or {}
         if resp.status_code != 200:
             return StepResult(6, "Post-DNC verify", FAIL, f"HTTP {resp.status_code}")
 
-        body = resp.json()
         contact = body.get("contact", body)
         ctx.post_dnc_state = contact
         dnc_list = contact.get("doNotContact", [])
-        print(f"\n  doNotContact entries: {json.dumps(dnc_list, indent=2)}")
+        print(f"\n  doNotContact entries: {pretty_json(dnc_list)}")
 
-        # Compare before/after
-        pre_had_dnc = has_email_dnc(ctx.pre_dnc_state) if ctx.pre_dnc_state else None
-        post_has_dnc = has_email_dnc(contact)
+        # Compare before/after -- index each side by channel once
+        pre_channels = dnc_channels(ctx.pre_dnc_state) if ctx.pre_dnc_state else None
+        post_channels = dnc_channels(contact)
+        pre_had_dnc = "email" in pre_channels if pre_channels is not None else None
+        post_has_dnc = "email" in post_channels
 
         print(f"  Pre-DNC had email DNC:  {pre_had_dnc}")
         print(f"  Post-DNC has email DNC: {post_has_dnc}")
+        if pre_channels is not None and pre_channels != post_channels:
+            print(f"  DNC channels changed:   {sorted(pre_channels, key=str)} -> {sorted(post_channels, key=str)}")
 
         suspects_confirmed = []
         suspects_cleared = []
@@ -280,16 +294,11 @@ def step7_idempotency(ctx: DiagContext) -> StepResult:
         print("  Skipped — no contact_id from step 3")
         return StepResult(7, "Idempotency", SKIP, "No contact_id")
 
-    url = f"{ctx.base_url}/api/contacts/{ctx.contact_id}/dnc/email/add"
+    url = f"/api/contacts/{ctx.contact_id}/dnc/email/add"
     payload = {"reason": 1, "comments": "Unsubscribed via website (diagnose.py re-add)"}
     try:
-        resp = ctx.client.post(url, json=payload, auth=ctx.auth)
-        print_response(resp)
-
-        try:
-            body = resp.json()
-        except Exception:
-            body = {}
+        resp = ctx.client.post(url, json=payload)
+        body = print_response(resp) or {}
 
         suspects_confirmed = []
         suspects_cleared = []
@@ -405,9 +414,8 @@ def main():
         print("ERROR: Mautic credentials not set. Use --username/--password or env vars.")
         sys.exit(1)
 
-    auth = (username, password)
-    client = httpx.Client(timeout=15.0)
-    ctx = DiagContext(email=email, base_url=base_url, auth=auth, client=client)
+    client = httpx.Client(base_url=base_url, auth=(username, password), timeout=15.0, http2=True)
+    ctx = DiagContext(email=email, client=client)
     results: list[StepResult] = []
 
     # Step 1
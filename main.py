@@ -3,24 +3,39 @@ mauxy -- centralized newsletter subscription + unsubscribe proxy for Mautic.
 Manages contacts, segments, and DNC lists via Basic Auth -- credentials never
 exposed to browser.
 """
+import asyncio
+import hmac
 import os
+import queue
+import random
+import re
+import secrets
 import time
 import logging
+import logging.handlers
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import Annotated, Optional
 
 import aiosqlite
+from cachetools import TTLCache
 from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, EmailStr
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, StringConstraints
 import httpx
+import orjson
+import redis.asyncio
+from limits import RateLimitItem, parse_many as parse_rate_limits
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
-logging.basicConfig(level=logging.INFO)
+# Handlers only enqueue records; the listener thread does the stderr writes,
+# so logging never blocks the event loop. Started/stopped by the lifespan.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
 logger = logging.getLogger(__name__)
 
 # -- Config from env --------------------------------------------------------
@@ -28,33 +43,156 @@ MAUTIC_BASE_URL = os.environ.get("MAUTIC_BASE_URL", "")
 MAUTIC_USERNAME = os.environ.get("MAUTIC_USERNAME", "")
 MAUTIC_PASSWORD = os.environ.get("MAUTIC_PASSWORD", "")
 RATE_LIMIT = os.environ.get("RATE_LIMIT", "5/minute")
+REDIS_URL = os.environ.get("REDIS_URL", "")
 ACTION_LOG_DB = os.environ.get("ACTION_LOG_DB", "/data/actions.db")
 ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY", "")
+# Authorization header value /api/actions expects, built once; None disables the endpoint
+_EXPECTED_AUTH = f"Bearer {ADMIN_API_KEY}".encode() if ADMIN_API_KEY else None
+
+# Mautic API paths, relative to the shared client's base_url
+SEARCH_PATH = "/api/contacts"
+# Exact-match search query as (key, value) pairs; only where[0][val] varies per call.
+# minimal/limit: the where-eq filter already narrows to one address, skip field lists.
+SEARCH_FILTER_PARAMS = (("where[0][col]", "email"), ("where[0][expr]", "eq"))
+SEARCH_OPTION_PARAMS = (("minimal", "true"), ("limit", "1"))
+# Contact id of a search body that reports exactly one match, in Mautic's key order:
+# {"total": "1", "contacts": {"42": {... -- any other total or shape gets decoded.
+CONTACT_ID_RE = re.compile(rb'\s*\{\s*"total"\s*:\s*"?1"?\s*,\s*"contacts"\s*:\s*\{\s*"(\d+)"\s*:')
+DNC_ADD_PATH = "/api/contacts/{contact_id}/dnc/email/add"
+DNC_PAYLOAD = {"reason": 1, "comments": "Unsubscribed via website"}
+# Gateway errors are retried with jittered exponential backoff (0.1 s, 0.2 s, ...);
+# anything else (4xx, 500) is final on the first answer
+DNC_RETRY_STATUSES = (502, 503, 504)
+DNC_ATTEMPTS = 3
+DNC_RETRY_BASE_DELAY = 0.1
 
 # CORS origins (comma-separated)
 _raw_origins = os.environ.get(
     "ALLOWED_ORIGINS",
     "",
 )
-ALLOWED_ORIGINS = [o.strip() for o in _raw_origins.split(",") if o.strip()]
+# frozenset: CORSMiddleware keeps the collection as-is, so each origin check is a hash lookup
+ALLOWED_ORIGINS = frozenset(o.strip() for o in _raw_origins.split(",") if o.strip())
 
 # -- Startup validation -------------------------------------------------------
 if not MAUTIC_BASE_URL:
-    logger.warning("MAUTIC_BASE_URL is not set -- all unsubscribe requests will fail")
+    logger.warning("MAUTIC_BASE_URL is not set -- all unsubscribe requests will return 503")
 if not ALLOWED_ORIGINS:
     logger.warning("ALLOWED_ORIGINS is not set -- CORS will block all browser requests")
 
 # -- Mautic health check cache -----------------------------------------------
 _mautic_health = {"ok": True, "checked_at": 0.0, "detail": "pending"}
+if not MAUTIC_BASE_URL:
+    # Nothing to probe -- this result is final and _check_mautic never refreshes it
+    _mautic_health = {"ok": False, "checked_at": time.monotonic(), "detail": "not_configured"}
 HEALTH_CHECK_CACHE_TTL = 30
-HEALTH_CHECK_TIMEOUT = 5.0
+HEALTH_CHECK_TIMEOUT = 5.0  # total per probe, retries included -- below readinessProbe timeoutSeconds (8)
+# One refresh at a time -- concurrent probes on a stale cache share its result
+_mautic_health_lock = asyncio.Lock()
+
+# -- Rate limiting -------------------------------------------------------------
+# With REDIS_URL set, every replica shares one sliding window per client IP and
+# limit item: a sorted set of request timestamps, trimmed / counted / appended
+# atomically in Lua. Without it, slowapi keeps per-process counters as before.
+# RATE_LIMIT may hold several items ("5/minute;100/hour"); all of them apply.
+RATE_LIMITS: tuple[RateLimitItem, ...] = tuple(parse_rate_limits(RATE_LIMIT))
+RATE_LIMIT_KEY_PREFIX = "mauxy:rl:"
+# Explicit, short socket timeouts (redis-py 5.x defaults to none): a blackholed
+# Redis must raise quickly so _rate_limit_exceeded can fail open
+REDIS_CONNECT_TIMEOUT = 0.25
+REDIS_SOCKET_TIMEOUT = 0.25
+# KEYS[i] = window key for limit item i; ARGV = now_ms, unique member, then
+# window_ms / limit per item. Every window is checked before any is counted, so
+# a request refused by one limit doesn't use up the others. Returns 0 when the
+# request is allowed, else the 1-based index of the first exceeded item.
+RATE_LIMIT_LUA = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[2 * i + 1])
+    redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+    if redis.call('ZCARD', key) >= tonumber(ARGV[2 * i + 2]) then
+        return i
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[2])
+    redis.call('PEXPIRE', key, ARGV[2 * i + 1])
+end
+return 0
+"""
+# Per-item key suffix ("<amount>:<window_ms>") and script args (window_ms, limit)
+_RATE_LIMIT_KEY_SUFFIXES = [f"{item.amount}:{item.get_expiry() * 1000}" for item in RATE_LIMITS]
+_RATE_LIMIT_ARGS = [
+    arg for item in RATE_LIMITS for arg in (item.get_expiry() * 1000, item.amount)
+]
+
+# -- Action log ----------------------------------------------------------------
+ACTION_LOG_COLUMNS = "id, ts, email, source_origin, source_ip, result, contact_id, error_detail"
+# One constant statement: the writer's executemany calls reuse its compiled form
+ACTION_LOG_INSERT_SQL = (
+    "INSERT INTO action_log (ts, email, source_origin, source_ip, result, contact_id, error_detail)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+# /api/actions queries, one per filter combination, keyed by bitmask:
+# 1 = email, 2 = result, 4 = before_id. Constant strings keep sqlite3's
+# per-connection statement cache hitting instead of re-preparing each call.
+_ACTIONS_FILTERS = ("email = ?", "result = ?", "id < ?")
+ACTIONS_SQL = {
+    mask: (
+        f"SELECT {ACTION_LOG_COLUMNS} FROM action_log"
+        + "".join(
+            (" AND " if mask & ((1 << i) - 1) else " WHERE ") + clause
+            for i, clause in enumerate(_ACTIONS_FILTERS)
+            if mask & (1 << i)
+        )
+        + " ORDER BY id DESC LIMIT ?"
+    )
+    for mask in range(1 << len(_ACTIONS_FILTERS))
+}
+# Write batching: rows queue up and a single writer task commits them together
+ACTION_LOG_QUEUE_SIZE = 10_000
+ACTION_LOG_BATCH_SIZE = 200
+
+# -- Contact search ETag cache -----------------------------------------------
+# email -> (etag, contact_id); repeat unsubscribes revalidate with If-None-Match
+SEARCH_ETAG_CACHE_SIZE = 10_000
+SEARCH_ETAG_CACHE_TTL = 3600
+_search_etags: TTLCache = TTLCache(maxsize=SEARCH_ETAG_CACHE_SIZE, ttl=SEARCH_ETAG_CACHE_TTL)
+
+# -- Unsubscribe de-duplication ----------------------------------------------
+# email -> contact_id of recent successful DNC adds; repeats skip Mautic entirely
+RECENT_UNSUBSCRIBE_CACHE_SIZE = 10_000
+RECENT_UNSUBSCRIBE_TTL = 300
+_recent_unsubscribes: TTLCache = TTLCache(maxsize=RECENT_UNSUBSCRIBE_CACHE_SIZE, ttl=RECENT_UNSUBSCRIBE_TTL)
+# email -> running unsubscribe task; concurrent duplicates await the same one
+_in_flight: dict[str, asyncio.Task] = {}
+
+# Fixed unsubscribe reply bodies, encoded once. The Response objects are still built
+# per request because middleware appends headers to a response's header list in place.
+UNSUBSCRIBE_BODIES = {
+    200: b'{"status":"ok"}',
+    503: b'{"status":"service_unavailable"}',
+}
 
 
 # -- SQLite lifespan --------------------------------------------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    _log_listener.start()
     db = await aiosqlite.connect(ACTION_LOG_DB)
-    await db.execute("""
+    # One executescript = one hop to aiosqlite's worker thread for the whole bootstrap.
+    # WAL + synchronous=NORMAL: commits append to the WAL without a full fsync each;
+    # a crash can lose the last few commits but never corrupts the log.
+    # PRAGMAs run before BEGIN -- journal_mode can't change inside a transaction.
+    await db.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA busy_timeout=5000;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-20000;  -- ~20 MB page cache
+        PRAGMA wal_autocheckpoint=1000;
+
+        BEGIN;
         CREATE TABLE IF NOT EXISTS action_log (
             id          INTEGER PRIMARY KEY AUTOINCREMENT,
             ts          TEXT    NOT NULL,
@@ -64,35 +202,86 @@ async def lifespan(app: FastAPI):
             result      TEXT    NOT NULL,
             contact_id  TEXT,
             error_detail TEXT
-        )
+        );
+        CREATE INDEX IF NOT EXISTS idx_action_log_email ON action_log(email);
+        CREATE INDEX IF NOT EXISTS idx_action_log_result ON action_log(result);
+        COMMIT;
     """)
-    await db.execute(
-        "CREATE INDEX IF NOT EXISTS idx_action_log_email ON action_log(email)"
-    )
-    await db.execute(
-        "CREATE INDEX IF NOT EXISTS idx_action_log_result ON action_log(result)"
-    )
-    await db.commit()
     app.state.db = db
     logger.info("ACTION_LOG_DB opened: %s", ACTION_LOG_DB)
+
+    # Request handlers only enqueue action_log rows; one writer task commits them
+    app.state.log_q = asyncio.Queue(maxsize=ACTION_LOG_QUEUE_SIZE)
+    app.state.log_task = asyncio.create_task(_action_log_writer(db, app.state.log_q))
+
+    # Shared Mautic client (unsubscribe + health checks) -- pooled keep-alive
+    # connections survive across requests
+    app.state.http = httpx.AsyncClient(
+        base_url=MAUTIC_BASE_URL,
+        auth=(MAUTIC_USERNAME, MAUTIC_PASSWORD),
+        timeout=httpx.Timeout(15.0, connect=5.0),
+        # The transport retries failed connects only; HTTP-level retries are explicit
+        transport=httpx.AsyncHTTPTransport(
+            retries=1,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0),
+            http2=True,
+        ),
+    )
+
+    app.state.redis = None
+    if REDIS_URL:
+        app.state.redis = redis.asyncio.from_url(
+            REDIS_URL,
+            socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+        )
+        # register_script: EVALSHA, re-sending the body only if Redis lost it
+        app.state.rl_script = app.state.redis.register_script(RATE_LIMIT_LUA)
+        logger.info("RATE_LIMIT redis limits=%s", "; ".join(str(item) for item in RATE_LIMITS))
     yield
+    if app.state.redis is not None:
+        await app.state.redis.aclose()
+    await app.state.http.aclose()
+    await app.state.log_q.put(None)  # flush what's queued, then stop the writer
+    await app.state.log_task
     await db.close()
     logger.info("ACTION_LOG_DB closed")
+    _log_listener.stop()
 
 
 # -- App setup --------------------------------------------------------------
-limiter = Limiter(key_func=get_remote_address)
+class OrjsonResponse(JSONResponse):
+    """JSONResponse rendered with orjson instead of stdlib json.dumps."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+# In-process fallback; the Redis windows in _rate_limit_exceeded replace it when configured
+limiter = Limiter(key_func=get_remote_address, enabled=not REDIS_URL)
 app = FastAPI(
     title="Mauxy",
     docs_url=None,
     redoc_url=None,
     lifespan=lifespan,
+    default_response_class=OrjsonResponse,
 )
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+
+class ApiCORSMiddleware(CORSMiddleware):
+    """CORSMiddleware scoped to /api/* -- k8s probes on /health skip it entirely."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
 app.add_middleware(
-    CORSMiddleware,
+    ApiCORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_methods=["POST", "OPTIONS"],
     allow_headers=["Content-Type"],
@@ -100,6 +289,22 @@ app.add_middleware(
 
 
 # -- Helpers ----------------------------------------------------------------
+_ts_second = (0, "")  # (unix second, its "%Y-%m-%dT%H:%M:%S" UTC form)
+
+
+def _utc_timestamp() -> str:
+    """
+    Current UTC time in the isoformat() shape action_log rows already use,
+    e.g. 2026-01-01T12:00:00.123456+00:00. The seconds part is formatted once
+    per second; each call only adds the microseconds.
+    """
+    global _ts_second
+    sec, ns = divmod(time.time_ns(), 1_000_000_000)
+    if sec != _ts_second[0]:
+        _ts_second = (sec, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec)))
+    return f"{_ts_second[1]}.{ns // 1000:06d}+00:00"
+
+
 async def log_action(
     request: Request,
     email: str,
@@ -109,69 +314,289 @@ async def log_action(
 ):
     origin = request.headers.get("origin", "")
     ip = request.client.host if request.client else ""
-    ts = datetime.now(timezone.utc).isoformat()
+    ts = _utc_timestamp()
+    await request.app.state.log_q.put((ts, email, origin, ip, result, contact_id, error_detail))
+
+
+async def _rate_limit_exceeded(request: Request) -> Optional[RateLimitItem]:
+    """
+    Count this request against the shared Redis windows for the client IP;
+    returns the limit item it exceeds, or None when it is allowed.
+    Always None without Redis (slowapi handles it) and when Redis errors --
+    a limiter outage must not take unsubscribes down with it.
+    """
+    r = request.app.state.redis
+    if r is None:
+        return None
+    now_ms = time.time_ns() // 1_000_000
+    # {ip} hash tag: all of one client's window keys land in the same cluster slot
+    key_base = f"{RATE_LIMIT_KEY_PREFIX}{{{get_remote_address(request)}}}:"
     try:
-        db: aiosqlite.Connection = request.app.state.db
-        await db.execute(
-            """INSERT INTO action_log
-               (ts, email, source_origin, source_ip, result, contact_id, error_detail)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (ts, email, origin, ip, result, contact_id, error_detail),
+        exceeded = await request.app.state.rl_script(
+            keys=[key_base + suffix for suffix in _RATE_LIMIT_KEY_SUFFIXES],
+            args=[now_ms, f"{now_ms}-{secrets.token_hex(4)}", *_RATE_LIMIT_ARGS],
         )
-        await db.commit()
-    except Exception as exc:
-        logger.error("ACTION_LOG_WRITE_ERROR error=%s", exc)
+    except redis.RedisError as exc:
+        logger.warning("RATE_LIMIT_REDIS_ERROR error=%s", exc)
+        return None
+    return RATE_LIMITS[exceeded - 1] if exceeded else None
+
+
+async def _action_log_writer(db: aiosqlite.Connection, q: asyncio.Queue):
+    """
+    Drain queued action_log rows and commit them in batches of up to
+    ACTION_LOG_BATCH_SIZE -- one transaction (and fsync) per batch instead of per row.
+    Returns once it takes the None sentinel, after writing everything queued before it.
+    """
+    stopping = False
+    while not stopping:
+        row = await q.get()
+        if row is None:
+            return
+        rows = [row]
+        while len(rows) < ACTION_LOG_BATCH_SIZE:
+            try:
+                row = q.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if row is None:
+                stopping = True
+                break
+            rows.append(row)
+
+        try:
+            # sqlite3 opens one implicit transaction for the whole batch
+            await db.executemany(ACTION_LOG_INSERT_SQL, rows)
+            await db.commit()
+        except Exception as exc:
+            logger.error("ACTION_LOG_WRITE_ERROR rows=%d error=%s", len(rows), exc)
+            # All-or-nothing: rows inserted before the failure must not ride along
+            # with the next batch's commit
+            try:
+                await db.rollback()
+            except Exception as rollback_exc:
+                logger.error("ACTION_LOG_ROLLBACK_ERROR error=%s", rollback_exc)
 
 
 # -- Models -----------------------------------------------------------------
+# Cheap shape check, checked in the handler -- Mautic does the real matching, so
+# full RFC / IDN validation per request buys nothing. A malformed address gets the
+# same 200 as any other outcome instead of a 422 that would stand out.
+# max_length (RFC 5321's 254) still 422s oversized input, so nothing attacker-sized
+# reaches the logs, action_log or Mautic's where[0][val].
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+EMAIL_MAX_LENGTH = 254
+Email = Annotated[str, StringConstraints(strip_whitespace=True, to_lower=True, max_length=EMAIL_MAX_LENGTH)]
+
+
 class UnsubscribeRequest(BaseModel):
-    email: EmailStr
+    email: Email
+
+
+def _contact_email(cdata: dict) -> str:
+    """
+    Pull the email out of a Mautic contact record, lowercased. Minimal responses
+    carry it top-level; full ones only under fields.core.email.value.
+    """
+    try:
+        value = cdata.get("email")
+        if value is None:
+            value = cdata["fields"]["core"]["email"]["value"]
+        return (value or "").lower()
+    except (AttributeError, KeyError, TypeError):
+        return ""
+
+
+def _find_contact(body: bytes, email: str) -> tuple[Optional[str], list]:
+    """
+    Pick the matching contact id out of a search response body.
+    When the where-eq filter reports a single match (total 1), that contact is the
+    one, so a bytes-level scan reads its id without decoding anything. Every other
+    body -- several matches, or a shape the scan doesn't recognise -- falls back to
+    a full decode with exact email verification.
+    Returns (contact_id, non-matching candidate ids); contact_id is None on no match.
+    Raises ValueError (orjson.JSONDecodeError included) for bodies that aren't a
+    search response.
+    """
+    m = CONTACT_ID_RE.match(body)
+    if m:
+        return m.group(1).decode(), []
+
+    data = orjson.loads(body)
+    if not isinstance(data, dict):
+        raise ValueError(f"search body is {type(data).__name__}, not an object")
+    contacts = data.get("contacts") or {}  # Mautic sends [] when nothing matched
+    if not isinstance(contacts, dict):
+        raise ValueError(f"search contacts is {type(contacts).__name__}, not an object")
+    candidates = []
+    for cid, cdata in contacts.items():
+        if _contact_email(cdata) == email:
+            return cid, candidates
+        candidates.append(cid)
+    return None, candidates
 
 
 # -- Mautic connectivity check -----------------------------------------------
-async def _check_mautic() -> dict:
-    """Check Mautic API reachability; cache result for HEALTH_CHECK_CACHE_TTL seconds."""
+async def _check_mautic(client: httpx.AsyncClient) -> dict:
+    """
+    Check Mautic API reachability; cache result for HEALTH_CHECK_CACHE_TTL seconds.
+    Only one refresh runs at a time; callers queued behind it reuse its result.
+    """
     global _mautic_health
-    now = time.monotonic()
-    if now - _mautic_health["checked_at"] < HEALTH_CHECK_CACHE_TTL:
+    if not MAUTIC_BASE_URL or time.monotonic() - _mautic_health["checked_at"] < HEALTH_CHECK_CACHE_TTL:
         return _mautic_health
 
-    try:
-        async with httpx.AsyncClient(timeout=HEALTH_CHECK_TIMEOUT) as client:
-            resp = await client.get(
-                f"{MAUTIC_BASE_URL}/api/contacts?limit=1",
-                auth=(MAUTIC_USERNAME, MAUTIC_PASSWORD),
+    async with _mautic_health_lock:
+        now = time.monotonic()
+        if now - _mautic_health["checked_at"] < HEALTH_CHECK_CACHE_TTL:
+            return _mautic_health  # refreshed while we waited for the lock
+
+        try:
+            # Same cheap minimal/limit=1 listing the contact search uses. wait_for caps the
+            # whole call: the shared transport retries a failed connect, and the per-request
+            # timeout alone would apply to each attempt (2x past the readiness probe timeout)
+            resp = await asyncio.wait_for(
+                client.get(SEARCH_PATH, params=SEARCH_OPTION_PARAMS, timeout=HEALTH_CHECK_TIMEOUT),
+                HEALTH_CHECK_TIMEOUT,
             )
+            if resp.status_code == 200:
+                _mautic_health = {"ok": True, "checked_at": now, "detail": "reachable"}
+            else:
+                detail = f"HTTP {resp.status_code}"
+                logger.warning("HEALTH_MAUTIC_HTTP_ERROR status=%s", resp.status_code)
+                _mautic_health = {"ok": False, "checked_at": now, "detail": detail}
+        except (httpx.RequestError, TimeoutError) as exc:
+            detail = f"connection error: {exc.__class__.__name__}"
+            logger.error("HEALTH_MAUTIC_CONNECT_ERROR error=%r", exc)
+            _mautic_health = {"ok": False, "checked_at": now, "detail": detail}
+        except Exception as exc:
+            detail = f"unexpected: {exc.__class__.__name__}"
+            logger.error("HEALTH_MAUTIC_UNEXPECTED_ERROR error=%s", exc)
+            _mautic_health = {"ok": False, "checked_at": now, "detail": detail}
+
+        return _mautic_health
+
+
+# -- Unsubscribe flow -------------------------------------------------------
+def _unsubscribe_response(status_code: int) -> Response:
+    """Wrap a pre-encoded unsubscribe body -- no JSON serialization per request."""
+    return Response(UNSUBSCRIBE_BODIES[status_code], status_code=status_code, media_type="application/json")
+
+
+async def _unsubscribe(request: Request, email: str) -> int:
+    """Search Mautic for email and add it to DNC; returns the HTTP status to answer with."""
+    client: httpx.AsyncClient = request.app.state.http
+    logger.info("UNSUBSCRIBE_START email=%s", email)
+
+    # Phase 1: Search for contact -- failures here are email-independent, return 503
+    cached = _search_etags.get(email)
+    contact_id, candidates = None, []
+    try:
+        resp = await client.get(
+            SEARCH_PATH,
+            params=SEARCH_FILTER_PARAMS + (("where[0][val]", email),) + SEARCH_OPTION_PARAMS,
+            headers={"If-None-Match": cached[0]} if cached else None,
+        )
         if resp.status_code == 200:
-            _mautic_health = {"ok": True, "checked_at": now, "detail": "reachable"}
+            contact_id, candidates = _find_contact(resp.content, email)
+    except httpx.RequestError as exc:
+        logger.error("UNSUBSCRIBE_MAUTIC_UNREACHABLE email=%s error=%s", email, exc)
+        await log_action(request, email, "mautic_unreachable", error_detail=f"httpx_error: {exc}")
+        return 503
+    except ValueError as exc:  # not JSON, or JSON that isn't a search response
+        logger.warning("UNSUBSCRIBE_SEARCH_INVALID_BODY email=%s error=%s", email, exc.__class__.__name__)
+        await log_action(request, email, "mautic_error", error_detail="search_body_invalid")
+        return 503
+
+    revalidated = cached is not None and resp.status_code == 304
+    if resp.status_code != 200 and not revalidated:
+        logger.warning("UNSUBSCRIBE_SEARCH_FAILED email=%s status=%s", email, resp.status_code)
+        await log_action(request, email, "mautic_error", error_detail=f"search_status={resp.status_code}")
+        return 503
+
+    # Phase 2: Contact-specific logic -- always 200 to prevent enumeration
+    try:
+        if revalidated:
+            # 304 Not Modified -- search result unchanged, reuse the cached contact_id
+            contact_id = cached[1]
+            logger.info("UNSUBSCRIBE_CONTACT_CACHED email=%s contact_id=%s", email, contact_id)
         else:
-            detail = f"HTTP {resp.status_code}"
-            logger.warning("HEALTH_MAUTIC_HTTP_ERROR status=%s", resp.status_code)
-            _mautic_health = {"ok": False, "checked_at": now, "detail": detail}
+            _search_etags.pop(email, None)
+            if contact_id is None and not candidates:
+                logger.warning("UNSUBSCRIBE_NO_CONTACT email=%s", email)
+                await log_action(request, email, "not_found")
+                return 200
+
+            # Fallback decode saw candidates, but none matched the email exactly
+            if contact_id is None:
+                logger.warning("UNSUBSCRIBE_NO_EXACT_MATCH email=%s candidates=%s", email, candidates)
+                await log_action(request, email, "not_found", error_detail=f"no_exact_match candidates={candidates}")
+                return 200
+
+            etag = resp.headers.get("etag")
+            if etag:
+                _search_etags[email] = (etag, contact_id)
+            logger.info("UNSUBSCRIBE_CONTACT_FOUND email=%s contact_id=%s", email, contact_id)
+
+        # Add contact to DNC -- up to DNC_ATTEMPTS tries with jittered backoff on gateway
+        # errors; any other status is final, retrying won't change it
+        dnc_path = DNC_ADD_PATH.format(contact_id=contact_id)
+        for attempt in range(1, DNC_ATTEMPTS + 1):
+            dnc_resp = await client.post(dnc_path, json=DNC_PAYLOAD)
+            if dnc_resp.status_code not in DNC_RETRY_STATUSES or attempt == DNC_ATTEMPTS:
+                break
+            logger.warning(
+                "UNSUBSCRIBE_DNC_FAILED email=%s status=%s attempt=%d",
+                email, dnc_resp.status_code, attempt,
+            )
+            await asyncio.sleep(DNC_RETRY_BASE_DELAY * 2 ** (attempt - 1) + random.random() * 0.05)
+
+        if dnc_resp.status_code in (200, 201):
+            logger.info("UNSUBSCRIBE_DNC_OK email=%s contact_id=%s", email, contact_id)
+            _recent_unsubscribes[email] = str(contact_id)
+            await log_action(request, email, "ok", contact_id=str(contact_id))
+        else:
+            logger.error(
+                "UNSUBSCRIBE_DNC_FAILED email=%s contact_id=%s status=%s",
+                email, contact_id, dnc_resp.status_code,
+            )
+            await log_action(
+                request, email, "error", contact_id=str(contact_id),
+                error_detail=f"dnc_status={dnc_resp.status_code}",
+            )
+
     except httpx.RequestError as exc:
-        detail = f"connection error: {exc.__class__.__name__}"
-        logger.error("HEALTH_MAUTIC_CONNECT_ERROR error=%s", exc)
-        _mautic_health = {"ok": False, "checked_at": now, "detail": detail}
+        logger.error("UNSUBSCRIBE_DNC_REQUEST_ERROR email=%s error=%s", email, exc)
+        await log_action(request, email, "error", error_detail=f"httpx_error: {exc}")
     except Exception as exc:
-        detail = f"unexpected: {exc.__class__.__name__}"
-        logger.error("HEALTH_MAUTIC_UNEXPECTED_ERROR error=%s", exc)
-        _mautic_health = {"ok": False, "checked_at": now, "detail": detail}
+        logger.error("UNSUBSCRIBE_UNEXPECTED_ERROR email=%s error=%s", email, exc)
+        await log_action(request, email, "error", error_detail=f"unexpected: {exc}")
 
-    return _mautic_health
+    # 200 for all contact-specific outcomes -- no enumeration leak
+    return 200
 
 
 # -- Routes -----------------------------------------------------------------
-@app.get("/health")
-async def health():
+@lru_cache(maxsize=32)
+def _health_body(detail: str) -> bytes:
+    """Encoded /health body -- there are only a handful of distinct Mautic details."""
+    return orjson.dumps({"status": "ok", "mautic": detail})
+
+
+async def health(request: Request) -> Response:
     """k8s liveness / readiness probe — always 200, includes Mautic status."""
-    result = await _check_mautic()
-    return {"status": "ok", "mautic": result["detail"]}
+    result = await _check_mautic(request.app.state.http)
+    return Response(_health_body(result["detail"]), media_type="application/json")
+
+
+# Plain Starlette route: probes skip FastAPI's dependency and serialization layers
+app.add_route("/health", health, methods=["GET"])
 
 
 @app.get("/health/detail")
-async def health_detail():
+async def health_detail(request: Request):
     """Richer health endpoint for operator debugging."""
-    result = await _check_mautic()
+    result = await _check_mautic(request.app.state.http)
     return {
         "status": "ok" if result["ok"] else "degraded",
         "mautic": result["detail"],
@@ -179,99 +604,57 @@ async def health_detail():
     }
 
 
-@app.post("/api/unsubscribe")
 @limiter.limit(RATE_LIMIT)
 async def unsubscribe(payload: UnsubscribeRequest, request: Request):
     """
     Add email to Mautic DNC list.
     Returns 200 {"status":"ok"} for all contact-specific outcomes (prevents enumeration).
     Returns 503 {"status":"service_unavailable"} when Mautic cannot be reached at all.
+    Concurrent requests for the same email share one Mautic round trip, and an email
+    that was just added to DNC skips Mautic for RECENT_UNSUBSCRIBE_TTL seconds.
     """
-    email = payload.email.lower()
-    auth = (MAUTIC_USERNAME, MAUTIC_PASSWORD)
-    logger.info("UNSUBSCRIBE_START email=%s", email)
-
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        # Phase 1: Search for contact -- failures here are email-independent, return 503
-        search_url = f"{MAUTIC_BASE_URL}/api/contacts"
-        try:
-            resp = await client.get(
-                search_url,
-                params={
-                    "where[0][col]": "email",
-                    "where[0][expr]": "eq",
-                    "where[0][val]": email,
-                },
-                auth=auth,
-            )
-        except httpx.RequestError as exc:
-            logger.error("UNSUBSCRIBE_MAUTIC_UNREACHABLE email=%s error=%s", email, exc)
-            await log_action(request, email, "mautic_unreachable", error_detail=f"httpx_error: {exc}")
-            return JSONResponse({"status": "service_unavailable"}, status_code=503)
-
-        if resp.status_code != 200:
-            logger.warning("UNSUBSCRIBE_SEARCH_FAILED email=%s status=%s", email, resp.status_code)
-            await log_action(request, email, "mautic_error", error_detail=f"search_status={resp.status_code}")
-            return JSONResponse({"status": "service_unavailable"}, status_code=503)
-
-        # Phase 2: Contact-specific logic -- always 200 to prevent enumeration
-        try:
-            contacts = resp.json().get("contacts", {})
-            if not contacts:
-                logger.warning("UNSUBSCRIBE_NO_CONTACT email=%s", email)
-                await log_action(request, email, "not_found")
-                return JSONResponse({"status": "ok"})
+    exceeded = await _rate_limit_exceeded(request)
+    if exceeded is not None:
+        return OrjsonResponse({"error": f"Rate limit exceeded: {exceeded}"}, status_code=429)
+
+    email = payload.email
+    if not _EMAIL_RE.match(email):
+        logger.info("UNSUBSCRIBE_INVALID_EMAIL email=%r", email)
+        await log_action(request, email, "invalid_email")
+        return _unsubscribe_response(200)
+
+    recent_contact_id = _recent_unsubscribes.get(email)
+    if recent_contact_id is not None:
+        logger.info("UNSUBSCRIBE_RECENT email=%s contact_id=%s", email, recent_contact_id)
+        await log_action(
+            request, email, "duplicate",
+            contact_id=recent_contact_id, error_detail="recently_unsubscribed",
+        )
+        return _unsubscribe_response(200)
 
-            # Defense in depth: verify exact email match among results
-            contact_id = None
-            for cid, cdata in contacts.items():
-                fields = cdata.get("fields", {}).get("core", {})
-                contact_email = (fields.get("email", {}).get("value") or "").lower()
-                if contact_email == email:
-                    contact_id = cid
-                    break
+    task = _in_flight.get(email)
+    if task is None:
+        task = asyncio.create_task(_unsubscribe(request, email))
+        _in_flight[email] = task
+        task.add_done_callback(lambda _: _in_flight.pop(email, None))
+    else:
+        logger.info("UNSUBSCRIBE_COALESCED email=%s", email)
+        await log_action(request, email, "duplicate", error_detail="coalesced_in_flight")
 
-            if contact_id is None:
-                candidates = list(contacts.keys())
-                logger.warning("UNSUBSCRIBE_NO_EXACT_MATCH email=%s candidates=%s", email, candidates)
-                await log_action(request, email, "not_found", error_detail=f"no_exact_match candidates={candidates}")
-                return JSONResponse({"status": "ok"})
+    # shield: one caller going away must not cancel the call the others await
+    return _unsubscribe_response(await asyncio.shield(task))
 
-            logger.info("UNSUBSCRIBE_CONTACT_FOUND email=%s contact_id=%s", email, contact_id)
 
-            # Add contact to DNC with retry (2 attempts)
-            dnc_url = f"{MAUTIC_BASE_URL}/api/contacts/{contact_id}/dnc/email/add"
-            dnc_ok = False
-            for attempt in range(1, 3):
-                dnc_resp = await client.post(
-                    dnc_url,
-                    json={"reason": 1, "comments": "Unsubscribed via website"},
-                    auth=auth,
-                )
-                if dnc_resp.status_code in (200, 201):
-                    logger.info("UNSUBSCRIBE_DNC_OK email=%s contact_id=%s", email, contact_id)
-                    dnc_ok = True
-                    break
-                logger.warning(
-                    "UNSUBSCRIBE_DNC_FAILED email=%s status=%s attempt=%d",
-                    email, dnc_resp.status_code, attempt,
-                )
-
-            if dnc_ok:
-                await log_action(request, email, "ok", contact_id=str(contact_id))
-            else:
-                logger.error("UNSUBSCRIBE_DNC_FAILED_RETRY_EXHAUSTED email=%s contact_id=%s", email, contact_id)
-                await log_action(request, email, "error", contact_id=str(contact_id), error_detail="dnc_retry_exhausted")
+async def unsubscribe_not_configured(request: Request) -> Response:
+    """Stand-in for unsubscribe without MAUTIC_BASE_URL -- 503 with no per-request work."""
+    return _unsubscribe_response(503)
 
-        except httpx.RequestError as exc:
-            logger.error("UNSUBSCRIBE_DNC_REQUEST_ERROR email=%s error=%s", email, exc)
-            await log_action(request, email, "error", error_detail=f"httpx_error: {exc}")
-        except Exception as exc:
-            logger.error("UNSUBSCRIBE_UNEXPECTED_ERROR email=%s error=%s", email, exc)
-            await log_action(request, email, "error", error_detail=f"unexpected: {exc}")
 
-    # 200 for all contact-specific outcomes -- no enumeration leak
-    return JSONResponse({"status": "ok"})
+# Without a Mautic URL every unsubscribe would fail anyway; answer 503 up front
+if MAUTIC_BASE_URL:
+    app.post("/api/unsubscribe")(unsubscribe)
+else:
+    app.add_route("/api/unsubscribe", unsubscribe_not_configured, methods=["POST"])
 
 
 @app.get("/api/actions")
@@ -280,31 +663,37 @@ async def get_actions(
     email: Optional[str] = Query(None),
     result: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=500),
-    offset: int = Query(0, ge=0),
+    before_id: Optional[int] = Query(None, ge=1),
 ):
-    """Admin endpoint: query the action log. Requires Bearer token."""
-    if not ADMIN_API_KEY:
-        return JSONResponse({"error": "admin endpoint disabled"}, status_code=403)
+    """
+    Admin endpoint: query the action log, newest first. Requires Bearer token.
+    Keyset-paginated: pass the previous page's next_before_id as before_id.
+    """
+    if _EXPECTED_AUTH is None:
+        return OrjsonResponse({"error": "admin endpoint disabled"}, status_code=403)
 
-    auth_header = request.headers.get("authorization", "")
-    if auth_header != f"Bearer {ADMIN_API_KEY}":
-        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    # Headers arrive latin-1 decoded; re-encode to the raw bytes for a constant-time compare
+    auth_header = request.headers.get("authorization", "").encode("latin-1")
+    if not hmac.compare_digest(auth_header, _EXPECTED_AUTH):
+        return OrjsonResponse({"error": "unauthorized"}, status_code=401)
 
-    clauses = []
+    mask = 0
     params: list = []
     if email:
-        clauses.append("email = ?")
+        mask |= 1
         params.append(email.lower())
     if result:
-        clauses.append("result = ?")
+        mask |= 2
         params.append(result)
-
-    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
-    query = f"SELECT * FROM action_log{where} ORDER BY id DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    if before_id is not None:
+        # Range scan on id (rowid) -- unlike OFFSET, cost doesn't grow with page depth
+        mask |= 4
+        params.append(before_id)
+    params.append(limit)
 
     db: aiosqlite.Connection = request.app.state.db
     db.row_factory = aiosqlite.Row
-    rows = await db.execute_fetchall(query, params)
+    rows = await db.execute_fetchall(ACTIONS_SQL[mask], params)
     actions = [dict(row) for row in rows]
-    return JSONResponse({"actions": actions, "count": len(actions)})
+    next_before_id = actions[-1]["id"] if len(actions) == limit else None
+    return OrjsonResponse({"actions": actions, "count": len(actions), "next_before_id": next_before_id})